@@ -19,13 +19,43 @@ License: MIT
 
 import os
 import re
+import sys
 import json
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
+# pysubs2 is optional: when installed it handles ASS parsing (override tags,
+# comments, \N line breaks); otherwise the built-in regex parser is used
+try:
+    import pysubs2
+except ImportError:
+    pysubs2 = None
 
-@dataclass
+# orjson is optional: a much faster JSON encoder for the spec dump
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# One SRT/VTT cue: identifier line, timing line (H:MM:SS,mmm or H:MM:SS.mmm,
+# cue settings ignored), then the non-blank text lines. Compiled once and run
+# over the whole file as bytes, so it also works directly on an mmap buffer.
+_CUE_TIME = rb'(\d{1,2}):(\d{2}):(\d{2}[,.]\d{3,6})'
+_CUE_RE = re.compile(
+    rb'^[^\r\n]+\r?\n'
+    rb'[ \t]*' + _CUE_TIME + rb'[ \t]*-->[ \t]*' + _CUE_TIME + rb'[^\n]*\n'
+    rb'((?:[^\S\n]*\S[^\n]*(?:\n|\Z))+)',
+    re.MULTILINE
+)
+
+
+# dataclass(slots=True) needs Python 3.10; 3.9 gets plain dataclasses
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS)
 class SubtitleSegment:
     """Represents a subtitle segment with timing and text"""
     start: float  # Start time in seconds
@@ -34,7 +64,7 @@ class SubtitleSegment:
     index: int    # Original segment index for stable sorting
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class CaptionState:
     """Represents a caption state with timing and layout"""
     text: str           # Display text (wrapped)
@@ -51,9 +81,17 @@ class SubtitleParser:
     @staticmethod
     def parse_ass(file_path: str) -> List[SubtitleSegment]:
         """Parse ASS subtitle file"""
-        segments = []
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
+        return SubtitleParser._parse_ass_content(content)
+    
+    @staticmethod
+    def _parse_ass_content(content: str) -> List[SubtitleSegment]:
+        """Parse the text of an ASS subtitle file"""
+        if pysubs2 is not None:
+            return SubtitleParser._parse_ass_pysubs2(content)
+        
+        segments = []
         
         # Find Events section
         events_match = re.search(r'\[Events\].*?(?=\[|$)', content, re.DOTALL)
@@ -81,66 +119,54 @@ class SubtitleParser:
         
         return segments
     
+    @staticmethod
+    def _parse_ass_pysubs2(content: str) -> List[SubtitleSegment]:
+        """Parse ASS subtitle text with pysubs2 (plain text, comments dropped)"""
+        # Only ever called for .ass input, so don't let pysubs2 guess: a file
+        # with just an [Events] section would otherwise be sniffed as SRT
+        subs = pysubs2.SSAFile.from_string(content, format_='ass')
+        return [
+            SubtitleSegment(
+                start=event.start / 1000.0,  # pysubs2 times are in ms
+                end=event.end / 1000.0,
+                text=event.plaintext.strip(),
+                index=i
+            )
+            for i, event in enumerate(subs)
+            if not event.is_comment
+        ]
+    
     @staticmethod
     def parse_srt(file_path: str) -> List[SubtitleSegment]:
         """Parse SRT subtitle file"""
-        segments = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Split into subtitle blocks
-        blocks = re.split(r'\n\s*\n', content.strip())
-        
-        for i, block in enumerate(blocks):
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                # Parse timecode line (e.g., "00:00:00,000 --> 00:00:07,350")
-                time_match = re.match(r'(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})', lines[1])
-                if time_match:
-                    start_time = SubtitleParser._parse_srt_time(time_match.group(1))
-                    end_time = SubtitleParser._parse_srt_time(time_match.group(2))
-                    text = ' '.join(lines[2:]).strip()
-                    
-                    if start_time is not None and end_time is not None:
-                        segments.append(SubtitleSegment(
-                            start=start_time,
-                            end=end_time,
-                            text=text,
-                            index=i
-                        ))
-        
-        return segments
+        with open(file_path, 'rb') as f:
+            return SubtitleParser._parse_cues(f.read())
     
     @staticmethod
     def parse_vtt(file_path: str) -> List[SubtitleSegment]:
         """Parse VTT subtitle file"""
-        segments = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Split into subtitle blocks (skip WEBVTT header)
-        blocks = re.split(r'\n\s*\n', content.strip())
+        # The WEBVTT header and NOTE blocks have no timing line, so they never match
+        with open(file_path, 'rb') as f:
+            return SubtitleParser._parse_cues(f.read())
+    
+    @staticmethod
+    def _parse_cues(data: bytes) -> List[SubtitleSegment]:
+        """Parse SRT/VTT cues from a bytes-like buffer in a single regex scan"""
+        # The pattern only knows \n; fold CRLF and old Mac CR-only line
+        # endings first, as text mode's universal newlines used to
+        if data.find(b'\r') != -1:
+            data = re.sub(rb'\r\n?', b'\n', data)
         
-        for i, block in enumerate(blocks):
-            if block.startswith('WEBVTT'):
-                continue
-                
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                # Parse timecode line (e.g., "0:00:00.000 --> 0:00:02.535692")
-                time_match = re.match(r'(\d{1,2}:\d{2}:\d{2}\.\d{3,6})\s*-->\s*(\d{1,2}:\d{2}:\d{2}\.\d{3,6})', lines[1])
-                if time_match:
-                    start_time = SubtitleParser._parse_vtt_time(time_match.group(1))
-                    end_time = SubtitleParser._parse_vtt_time(time_match.group(2))
-                    text = ' '.join(lines[2:]).strip()
-                    
-                    if start_time is not None and end_time is not None:
-                        segments.append(SubtitleSegment(
-                            start=start_time,
-                            end=end_time,
-                            text=text,
-                            index=i
-                        ))
+        segments = []
+        for i, match in enumerate(_CUE_RE.finditer(data)):
+            start_h, start_m, start_s, end_h, end_m, end_s, text = match.groups()
+            segments.append(SubtitleSegment(
+                start=int(start_h) * 3600 + int(start_m) * 60 + float(start_s.replace(b',', b'.')),
+                end=int(end_h) * 3600 + int(end_m) * 60 + float(end_s.replace(b',', b'.')),
+                # Multi-line cue text is joined with spaces
+                text=b' '.join(text.splitlines()).decode('utf-8').strip(),
+                index=i
+            ))
         
         return segments
     
@@ -159,37 +185,26 @@ class SubtitleParser:
             raise ValueError(f"Unsupported subtitle format: {ext}")
     
     @staticmethod
-    def _parse_ass_time(time_str: str) -> Optional[float]:
-        """Parse ASS time format (H:MM:SS.cc)"""
-        try:
-            parts = time_str.split(':')
-            if len(parts) == 3:
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                seconds = float(parts[2])
-                return hours * 3600 + minutes * 60 + seconds
-        except (ValueError, IndexError):
-            pass
-        return None
-    
-    @staticmethod
-    def _parse_srt_time(time_str: str) -> Optional[float]:
-        """Parse SRT time format (HH:MM:SS,mmm)"""
-        try:
-            time_str = time_str.replace(',', '.')
-            parts = time_str.split(':')
-            if len(parts) == 3:
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                seconds = float(parts[2])
-                return hours * 3600 + minutes * 60 + seconds
-        except (ValueError, IndexError):
-            pass
-        return None
+    def parse_bytes(data: bytes, fmt: str) -> List[SubtitleSegment]:
+        """Parse subtitles from an in-memory buffer (bytes or mmap)
+        
+        fmt is the subtitle format as a file extension ('ass', 'srt' or 'vtt',
+        with or without the leading dot).
+        """
+        ext = fmt.lower().lstrip('.')
+        
+        if ext == 'ass':
+            return SubtitleParser._parse_ass_content(
+                bytes(data).decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+            )
+        elif ext in ('srt', 'vtt'):
+            return SubtitleParser._parse_cues(data)
+        else:
+            raise ValueError(f"Unsupported subtitle format: .{ext}")
     
     @staticmethod
-    def _parse_vtt_time(time_str: str) -> Optional[float]:
-        """Parse VTT time format (H:MM:SS.mmm)"""
+    def _parse_ass_time(time_str: str) -> Optional[float]:
+        """Parse ASS time format (H:MM:SS.cc)"""
         try:
             parts = time_str.split(':')
             if len(parts) == 3:
@@ -215,9 +230,9 @@ class CaptionGenerator:
     
     def tokenize(self, text: str) -> List[str]:
         """Split text into words with trailing punctuation"""
-        # Split on whitespace and filter empty strings
-        words = [word.strip() for word in re.split(r'\s+', text) if word.strip()]
-        return words
+        # str.split() with no separator collapses whitespace runs and never
+        # yields empty strings
+        return text.split()
     
     def compute_word_times(self, seg_start: float, seg_end: float, word_count: int) -> List[Tuple[float, float]]:
         """Synthesize uniform word timings with constraints"""
@@ -435,24 +450,33 @@ class MoviePyGenerator:
                            video_height: int = 1920) -> List[Dict]:
         """Generate MoviePy text clip specifications"""
         text_clips = []
-        
-        for state in states:
-            if state.skip:
-                continue
-            
+
+        # Styling is identical for every caption; build it once and merge it
+        # into each spec instead of re-creating the same entries per state
+        style = {
+            'font_size': 54,
+            'font_color': 'white',
+            'font_file': self.font_file,
+            'bg_color': 'black',
+            'bg_opacity': 0.6
+        }
+
+        # Drop skipped states up front so the loop body has no branch
+        active_states = [state for state in states if not state.skip]
+
+        # One wrapper for all states, memoized since short captions repeat
+        wrap_text = lru_cache(maxsize=1024)(CaptionGenerator().wrap_text)
+
+        for state in active_states:
             # Wrap text
-            wrapped_text = CaptionGenerator().wrap_text(state.text)
+            wrapped_text = wrap_text(state.text)
             
             text_clips.append({
                 'text': wrapped_text,
                 'start_time': state.on,
                 'end_time': state.off,
                 'position': ('center', video_height - state.y),
-                'font_size': 54,
-                'font_color': 'white',
-                'font_file': self.font_file,
-                'bg_color': 'black',
-                'bg_opacity': 0.6
+                **style
             })
         
         return text_clips
@@ -494,8 +518,15 @@ def main():
     print(f"Generated {len(text_clips)} MoviePy text clip specifications")
     
     # Save MoviePy specs to JSON
-    with open("moviepy_specs.json", 'w', encoding='utf-8') as f:
-        json.dump(text_clips, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        # orjson encodes straight to UTF-8 bytes in one call
+        with open("moviepy_specs.json", 'wb') as f:
+            f.write(orjson.dumps(text_clips, option=orjson.OPT_INDENT_2))
+    else:
+        # json.dump writes one chunk per token, so give it a large buffer
+        # to batch them into few write() calls
+        with open("moviepy_specs.json", 'w', encoding='utf-8', buffering=1 << 20) as f:
+            json.dump(text_clips, f, indent=2, ensure_ascii=False)
     print("MoviePy specifications saved to 'moviepy_specs.json'")
     
     # Generate usage instructions
@@ -6,25 +6,34 @@ This script runs the progressive builder captions algorithm using MoviePy render
 It produces versioned outputs with Clip_MoviePy_V1.mp4, Clip_MoviePy_V2.mp4, etc.
 """
 
+import gc
 import os
+import re
 import sys
+import math
 import argparse
+import operator
+import contextlib
+import functools
 import logging
-from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-# Add parent directory to path for imports
+# Add parent directory to path for imports; progressive_captions (and its
+# optional parsers) is imported where it's used so --help stays fast
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from progressive_captions import SubtitleParser, CaptionGenerator, MoviePyGenerator
-
-def setup_logging(log_file: str):
-    """Setup logging to both file and console"""
+def setup_logging(log_file: str, level: int = logging.INFO):
+    """Setup logging to both file and console
+    
+    Per-caption messages are logged at DEBUG, so the default INFO level keeps
+    long runs from formatting and writing one line per caption.
+    """
     # Ensure log directory exists
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
     
     # Use text mode explicitly and ensure proper encoding
     logging.basicConfig(
-        level=logging.INFO,
+        level=level,
         format='%(asctime)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(log_file, mode='w', encoding='utf-8'),
@@ -32,14 +41,21 @@ def setup_logging(log_file: str):
         ]
     )
 
-def detect_fonts():
-    """Detect available Poppins fonts"""
-    fonts = {
-        'Black': False,
-        'Bold': False,
-        'ExtraBold': False
-    }
+FONT_FILES = {
+    'Black': 'Poppins-Black.ttf',
+    'Bold': 'Poppins-Bold.ttf',
+    'ExtraBold': 'Poppins-ExtraBold.ttf',
+    'BlackItalic': 'Poppins-BlackItalic.ttf',
+    'BoldItalic': 'Poppins-BoldItalic.ttf'
+}
+
+@functools.lru_cache(maxsize=1)
+def _resolve_fonts() -> Dict[str, Optional[str]]:
+    """Locate the Poppins fonts once: label -> absolute path (None if missing)
     
+    Each candidate directory is listed once with os.scandir instead of stat-ing
+    every font in every directory; the first directory holding a font wins.
+    """
     # Check for fonts in multiple possible locations
     # Get the script directory and check relative to it
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,25 +63,29 @@ def detect_fonts():
         '.',  # Current directory
         'AutoCaptions',  # AutoCaptions subdirectory
         os.path.join(script_dir, 'AutoCaptions'),  # Full path to AutoCaptions
-        os.path.join('AutoCaptions'),  # Relative AutoCaptions
         'outputs',  # Outputs directory
         os.path.join('AutoCaptions', 'outputs')  # AutoCaptions/outputs
     ]
     
+    labels = {file_name: label for label, file_name in FONT_FILES.items()}
+    fonts = dict.fromkeys(FONT_FILES)
     for font_dir in font_dirs:
-        black_path = os.path.join(font_dir, 'Poppins-Black.ttf')
-        bold_path = os.path.join(font_dir, 'Poppins-Bold.ttf')
-        extrabold_path = os.path.join(font_dir, 'Poppins-ExtraBold.ttf')
-        
-        if os.path.exists(black_path):
-            fonts['Black'] = True
-        if os.path.exists(bold_path):
-            fonts['Bold'] = True
-        if os.path.exists(extrabold_path):
-            fonts['ExtraBold'] = True
+        try:
+            with os.scandir(font_dir) as entries:
+                for entry in entries:
+                    label = labels.get(entry.name)
+                    if label and fonts[label] is None and entry.is_file():
+                        fonts[label] = os.path.abspath(entry.path)
+        except OSError:
+            continue  # Location doesn't exist
     
     return fonts
 
+def detect_fonts():
+    """Detect available Poppins fonts"""
+    fonts = _resolve_fonts()
+    return {label: fonts[label] is not None for label in ('Black', 'Bold', 'ExtraBold')}
+
 def get_wow_words():
     """Get list of 'wow' words that should use Poppins-ExtraBold font with special colors"""
     return {
@@ -91,16 +111,555 @@ def get_italic_words():
 
 def get_next_version(output_dir: str, base_name: str = "Clip_MoviePy_V"):
     """Get next available version number"""
-    version = 1
-    while os.path.exists(os.path.join(output_dir, f"{base_name}{version}.mp4")):
-        version += 1
-    return version
+    import glob
+    
+    # One directory listing instead of probing V1, V2, ... one stat at a time
+    pattern = re.compile(re.escape(base_name) + r'(\d+)\.mp4$')
+    versions = []
+    for path in glob.iglob(os.path.join(glob.escape(output_dir), f"{glob.escape(base_name)}*.mp4")):
+        match = pattern.search(os.path.basename(path))
+        if match:
+            versions.append(int(match.group(1)))
+    return max(versions) + 1 if versions else 1
+
+def _read_subtitles(subtitle_path: str):
+    """Parse a subtitle file through a read-only memory map of its bytes"""
+    import mmap
+    from progressive_captions import SubtitleParser
+    
+    ext = os.path.splitext(subtitle_path)[1]
+    with open(subtitle_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []  # mmap can't map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return SubtitleParser.parse_bytes(buf, ext)
+
+def _probe_video(path: str) -> Tuple[float, Tuple[int, int]]:
+    """Read container duration and (width, height) with ffprobe, without starting a decoder"""
+    import json
+    import subprocess
+    
+    output = subprocess.check_output([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'format=duration:stream=width,height:stream_side_data=rotation',
+        '-of', 'json',
+        path
+    ])
+    info = json.loads(output)
+    stream = info['streams'][0]
+    size = (stream['width'], stream['height'])
+    # Match MoviePy, which reports the displayed size of rotated phone footage
+    rotation = next((side['rotation'] for side in stream.get('side_data_list', []) if 'rotation' in side), 0)
+    if abs(int(rotation)) in (90, 270):
+        size = size[::-1]
+    return float(info['format']['duration']), size
 
-def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, log_path: str):
-    """Run MoviePy with progressive builder captions"""
+@functools.lru_cache(maxsize=16)
+def _font(font_path: Optional[str], font_size: int):
+    """Load a font once per path/size instead of re-parsing the TTF per caption"""
+    from PIL import ImageFont
+    
+    if font_path:
+        return ImageFont.truetype(font_path, font_size)
+    return ImageFont.load_default(font_size)
+
+@functools.lru_cache(maxsize=4096)
+def _text_length(font_path: Optional[str], font_size: int, text: str) -> float:
+    """Advance width of a line of text (memoized; words and phrases repeat)"""
+    return _font(font_path, font_size).getlength(text)
+
+@functools.lru_cache(maxsize=4096)
+def _text_bbox(font_path: Optional[str], font_size: int, text: str, stroke_width: int = 0):
+    """Bounding box of text drawn at the origin (memoized)"""
+    return _font(font_path, font_size).getbbox(text, stroke_width=stroke_width)
+
+@functools.lru_cache(maxsize=512)
+def _render_caption(text: str, font_path: Optional[str], font_size: int, color: str,
+                    max_width: int, margin: Tuple[int, int], stroke_width: int = 2):
+    """Rasterize a caption to an RGBA array with Pillow (memoized per text/style)
+    
+    Lines are broken on words to fit max_width and centered. Every line sits on
+    a baseline derived from the font metrics, so captions don't jump vertically
+    depending on which glyphs they contain.
+    """
+    import numpy as np
+    from PIL import Image, ImageDraw
+    
+    font = _font(font_path, font_size)
+    
+    # Break on words so no line overflows the safe width
+    lines = []
+    for paragraph in text.split('\n'):
+        current = ''
+        for word in paragraph.split():
+            candidate = f"{current} {word}" if current else word
+            if current and _text_length(font_path, font_size, candidate) + 2 * stroke_width > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    
+    # Same geometry as MoviePy's TextClip: Pillow's multiline line step
+    # ("A" height + stroke + 4px interline) and ascent+descent per line
+    ascent, descent = font.getmetrics()
+    line_height = _text_bbox(font_path, font_size, 'A', stroke_width)[3] + stroke_width + 4
+    h_margin, v_margin = margin
+    text_width = max(_text_length(font_path, font_size, line) for line in lines)
+    width = math.ceil(text_width) + 2 * (stroke_width + h_margin)
+    height = (ascent + descent) + (len(lines) - 1) * line_height + 2 * (stroke_width + v_margin)
+    
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    baseline = v_margin + stroke_width + ascent
+    for line in lines:
+        draw.text((width / 2, baseline), line, font=font, fill=color, anchor='ms',
+                  stroke_width=stroke_width, stroke_fill='black')
+        baseline += line_height
+    
+    return np.asarray(img)
+
+def _ass_timestamp(seconds: float) -> str:
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)"""
+    centiseconds = int(round(seconds * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def _ass_colour(color: str) -> str:
+    """Convert a color name/hex to an ASS &HAABBGGRR colour"""
+    from PIL import ImageColor
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def _ttf_win_metrics(font_path: str) -> Tuple[int, int, int]:
+    """Read (unitsPerEm, usWinAscent, usWinDescent) from a TrueType font
+    
+    libass sizes and places text by the OS/2 "win" cell rather than the hhea
+    metrics Pillow reports, so these are needed to match the Pillow rendering.
+    """
+    import struct
+    
+    with open(font_path, 'rb') as f:
+        data = f.read()
+    
+    num_tables = struct.unpack_from('>H', data, 4)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, offset, _ = struct.unpack_from('>4sIII', data, 12 + 16 * i)
+        tables[tag] = offset
+    
+    units_per_em = struct.unpack_from('>H', data, tables[b'head'] + 18)[0]
+    win_ascent, win_descent = struct.unpack_from('>HH', data, tables[b'OS/2'] + 74)
+    return units_per_em, win_ascent, win_descent
+
+def _write_ass(captions, ass_path: str, video_size):
+    """Write resolved captions as an ASS script, one style per caption style
+    
+    Each caption dict carries text, start_time, end_time, font, font_size,
+    color, style and y (top of the text line in video pixels).
+    """
+    video_width, video_height = video_size
+    side_margin = int(video_width * 0.05)  # Keep wrapping inside the 90% safe area
+    
+    style_lines = {}
+    baseline_shift = {}  # Per style: libass line top -> Pillow line top offset
+    event_lines = []
+    for caption in captions:
+        style_name = caption['style'].capitalize()
+        if style_name not in style_lines:
+            font_size = caption['font_size']
+            if caption['font']:
+                font = _font(caption['font'], font_size)
+                family, face = font.getname()
+                font_name = family if face == 'Regular' else f"{family} {face}"
+                # ASS font sizes are the OS/2 win cell height, not the em size
+                units_per_em, win_ascent, win_descent = _ttf_win_metrics(caption['font'])
+                ass_size = round(font_size * (win_ascent + win_descent) / units_per_em, 2)
+                ass_ascent = font_size * win_ascent / units_per_em
+            else:
+                font = _font(None, font_size)
+                font_name = 'Arial'
+                ass_size = sum(font.getmetrics())
+                ass_ascent = font.getmetrics()[0]
+            # Put the baseline where the Pillow renderer puts it
+            baseline_shift[style_name] = font.getmetrics()[0] - ass_ascent
+            style_lines[style_name] = (
+                f"Style: {style_name},{font_name},{ass_size},{_ass_colour(caption['color'])},"
+                f"&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,2,0,8,"
+                f"{side_margin},{side_margin},0,1"
+            )
+        
+        text = caption['text'].replace('\n', '\\N')
+        pos_y = round(caption['y'] + baseline_shift[style_name])
+        event_lines.append(
+            f"Dialogue: 0,{_ass_timestamp(caption['start_time'])},{_ass_timestamp(caption['end_time'])},"
+            f"{style_name},,0,0,0,,{{\\pos({video_width // 2},{pos_y})}}{text}"
+        )
+    
+    with open(ass_path, 'w', encoding='utf-8') as f:
+        f.write("[Script Info]\n")
+        f.write("ScriptType: v4.00+\n")
+        f.write(f"PlayResX: {video_width}\n")
+        f.write(f"PlayResY: {video_height}\n")
+        f.write("WrapStyle: 0\n\n")
+        f.write("[V4+ Styles]\n")
+        f.write("Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, "
+                "BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, "
+                "BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n")
+        f.write("\n".join(style_lines.values()) + "\n\n")
+        f.write("[Events]\n")
+        f.write("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+        f.write("\n".join(event_lines) + "\n")
+
+def _write_caption_json(captions, json_path: str, video_size):
+    """Write the resolved captions (timing, style, placement) as a JSON sidecar"""
+    import json
+    
+    sidecar = {
+        'video_size': list(video_size),
+        'captions': [
+            {
+                'text': caption['text'],
+                'start_time': caption['start_time'],
+                'end_time': caption['end_time'],
+                'style': caption['style'],
+                'font': os.path.basename(caption['font']) if caption['font'] else None,
+                'font_size': caption['font_size'],
+                'color': caption['color'],
+                'position_y': caption['position_y']
+            }
+            for caption in captions
+        ]
+    }
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, indent=2, ensure_ascii=False)
+
+def _escape_filter_value(value: str) -> str:
+    """Escape a value for use as an FFmpeg filter option inside -vf"""
+    # First the filter option level, then the filtergraph level
+    for char in ('\\', ':', "'"):
+        value = value.replace(char, '\\' + char)
+    for char in ('\\', "'", '[', ']', ',', ';'):
+        value = value.replace(char, '\\' + char)
+    return value
+
+X264_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+
+ENCODERS = ['libx264', 'h264_nvenc', 'h264_qsv']
+
+@functools.lru_cache(maxsize=1)
+def _pick_codec() -> str:
+    """Fastest usable H.264 encoder: NVENC, then Quick Sync, then libx264
+    
+    -encoders only lists what FFmpeg was built with, so each hardware encoder
+    is also tried on a few blank frames to confirm a device is present.
+    """
+    import subprocess
+    from moviepy.config import FFMPEG_BINARY
+    
+    try:
+        listing = subprocess.run([FFMPEG_BINARY, '-hide_banner', '-encoders'],
+                                 capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'libx264'
+    
+    for codec in ENCODERS[1:]:
+        if f' {codec} ' not in listing:
+            continue
+        probe = subprocess.run([
+            FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', 'color=black:size=256x256:duration=0.1',
+            '-c:v', codec, '-f', 'null', '-'
+        ], capture_output=True)
+        if probe.returncode == 0:
+            return codec
+    return 'libx264'
+
+# x264 preset names onto NVENC's p1 (fastest) to p7 (slowest); medium is p4,
+# NVENC's own default
+NVENC_PRESETS = {
+    'ultrafast': 'p1', 'superfast': 'p1', 'veryfast': 'p2', 'faster': 'p3', 'fast': 'p3',
+    'medium': 'p4', 'slow': 'p5', 'slower': 'p6', 'veryslow': 'p7'
+}
+
+# Consumer NVIDIA/Intel drivers cap concurrent encode sessions
+HW_ENCODER_SESSIONS = 2
+
+def _codec_settings(codec: str, preset: str, crf: Optional[int] = None) -> Tuple[str, list]:
+    """Map the libx264-style preset/CRF onto codec's own (preset, extra FFmpeg options)"""
+    if codec == 'h264_nvenc':
+        # NVENC has no CRF; constant-quality VBR is the analogue
+        return NVENC_PRESETS.get(preset, 'p4'), ['-rc', 'vbr', '-cq', str(crf if crf is not None else 23)]
+    if codec == 'h264_qsv':
+        # Quick Sync has no ultrafast/superfast; global_quality plays the role of CRF
+        qsv_preset = preset if preset in X264_PRESETS[2:] else 'veryfast'
+        return qsv_preset, ['-global_quality', str(crf if crf is not None else 23)]
+    return preset, ['-crf', str(crf)] if crf is not None else []
+
+def _video_codec_args(codec: str, preset: str, crf: Optional[int] = None,
+                      threads: Optional[int] = None):
+    """FFmpeg video encoder options; CRF and thread count are left to FFmpeg when None"""
+    codec_preset, params = _codec_settings(codec, preset, crf)
+    args = ['-c:v', codec, '-preset', codec_preset, *params]
+    if threads:
+        args += ['-threads', str(threads)]
+    return args
+
+def _burn_ass(video_path: str, ass_path: str, fonts_dir: Optional[str], output_path: str,
+              codec: str = 'libx264', preset: str = 'veryfast', crf: Optional[int] = None,
+              threads: Optional[int] = None):
+    """Burn an ASS script into the video with FFmpeg's libass filter (audio copied)"""
+    import subprocess
+    from moviepy.config import FFMPEG_BINARY
+    
+    video_filter = f"ass=filename={_escape_filter_value(ass_path)}"
+    if fonts_dir:
+        video_filter += f":fontsdir={_escape_filter_value(fonts_dir)}"
+    
+    subprocess.run([
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-i', video_path,
+        '-vf', video_filter,
+        *_video_codec_args(codec, preset, crf, threads),
+        '-c:a', 'copy',
+        output_path
+    ], check=True, capture_output=True, text=True)
+
+def _paste_rgba(canvas, img, x: int, y: int):
+    """Alpha-composite an RGBA caption image onto the RGBA canvas at (x, y)"""
+    import numpy as np
+    
+    # Clip to the frame (an unwrappable word can be wider than the video)
+    height, width = canvas.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + img.shape[1], width), min(y + img.shape[0], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = img[y0 - y:y1 - y, x0 - x:x1 - x]
+    region = canvas[y0:y1, x0:x1]
+    
+    if not region[..., 3].any():
+        region[:] = src
+        return
+    
+    # Captions on different levels can overlap; blend so one caption's
+    # transparent padding doesn't erase the other
+    src = src.astype(np.float32) / 255
+    dst = region.astype(np.float32) / 255
+    src_a, dst_a = src[..., 3:], dst[..., 3:]
+    out_a = src_a + dst_a * (1 - src_a)
+    out_rgb = (src[..., :3] * src_a + dst[..., :3] * dst_a * (1 - src_a)) / np.maximum(out_a, 1e-6)
+    region[..., :3] = np.round(out_rgb * 255)
+    region[..., 3:] = np.round(out_a * 255)
+
+def _pipe_overlay(video_path: str, captions, video_size, fps: float, duration: float,
+                  output_path: str, codec: str = 'libx264', preset: str = 'veryfast',
+                  crf: Optional[int] = None, threads: Optional[int] = None):
+    """Stream a caption-only RGBA layer to FFmpeg and overlay it on the video
+    
+    Python never decodes the source video: one canvas buffer is reused for
+    every frame, redrawn only when the set of visible captions changes, and
+    written to FFmpeg's stdin as-is. FFmpeg decodes, overlays and encodes,
+    copying the audio.
+    """
+    import subprocess
+    import tempfile
+    import numpy as np
+    from moviepy.config import FFMPEG_BINARY
+    
+    width, height = video_size
+    canvas = np.zeros((height, width, 4), dtype=np.uint8)
+    
+    # The events carry the images rasterized for the clips, so nothing is
+    # rendered twice even when the caption cache has evicted them
+    layers = sorted(
+        (
+            (caption['start_time'], caption['end_time'], caption['image'],
+             (width - caption['image'].shape[1]) // 2,  # Centered, as with_position('center')
+             caption['position_y'])
+            for caption in captions
+        ),
+        key=operator.itemgetter(0)
+    )
+    
+    cmd = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+        '-framerate', str(fps), '-i', 'pipe:0',
+        '-i', video_path,
+        '-filter_complex', '[1:v][0:v]overlay=eof_action=pass[v]',
+        '-map', '[v]', '-map', '1:a?',
+        *_video_codec_args(codec, preset, crf, threads),
+        '-c:a', 'copy',
+        output_path
+    ]
+    # stderr goes to a file, not a pipe: nothing reads it until every frame
+    # is written, and a full stderr pipe would block FFmpeg while we block on
+    # stdin. stdin stays buffered so each write() sends the whole frame.
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=stderr_file)
+        
+        try:
+            # Walk the start-sorted layers with a moving index: frames only
+            # look at captions that start or end, not at every caption
+            visible = []
+            next_layer = 0
+            for frame_index in range(math.ceil(duration * fps)):
+                t = frame_index / fps
+                changed = False
+                while next_layer < len(layers) and layers[next_layer][0] <= t:
+                    visible.append(layers[next_layer])
+                    next_layer += 1
+                    changed = True
+                still_visible = [layer for layer in visible if t < layer[1]]
+                if changed or len(still_visible) != len(visible):
+                    visible = still_visible
+                    canvas[:] = 0
+                    for _, _, caption_img, x, y in visible:
+                        _paste_rgba(canvas, caption_img, x, y)
+                proc.stdin.write(canvas)
+        except BrokenPipeError:
+            pass  # FFmpeg exited early; its error is reported below
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            proc.wait()
+        
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode('utf-8', errors='replace')
+    
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
+def _render_chunk(job):
+    """Encode one time range of the captioned video (multiprocessing worker)
+    
+    MoviePy clips can't be shared across processes, so each worker opens its
+    own reader and rebuilds clips from the caption images overlapping its
+    range. Chunks are video-only; the audio is muxed back in once when they
+    are concatenated.
+    """
+    from moviepy import VideoFileClip, ImageClip, CompositeVideoClip
+    
+    video_path, chunk_start, chunk_end, captions, chunk_path, codec, preset, crf, threads = job
+    video = VideoFileClip(video_path, audio=False)
+    segment = video.subclipped(chunk_start, chunk_end)
+    
+    overlays = []
+    for caption in captions:
+        overlays.append(
+            ImageClip(caption['image'], transparent=True)
+            .with_position(('center', caption['position_y']))
+            .with_start(max(caption['start_time'] - chunk_start, 0))
+            .with_end(min(caption['end_time'], chunk_end) - chunk_start)
+        )
+    
+    if overlays:
+        final = CompositeVideoClip(
+            [segment] + overlays, size=video.size, use_bgclip=True
+        ).with_duration(segment.duration)
+    else:
+        final = segment
+    codec_preset, params = _codec_settings(codec, preset, crf)
+    final.write_videofile(
+        chunk_path,
+        codec=codec,
+        preset=codec_preset,
+        threads=threads,
+        ffmpeg_params=params or None,
+        audio=False,
+        logger=None
+    )
+    
+    final.close()
+    video.close()
+    return chunk_path
+
+def _encode_parallel(video_path: str, captions, duration: float, fps: float, output_path: str,
+                     num_chunks: int, codec: str = 'libx264', preset: str = 'veryfast',
+                     crf: Optional[int] = None, threads: int = 2):
+    """Encode the captioned video as num_chunks time ranges in parallel, then
+    stitch them with FFmpeg's concat demuxer (no re-encode) and the source audio
+    """
+    import multiprocessing
+    import subprocess
+    import tempfile
+    from moviepy.config import FFMPEG_BINARY
+    
+    # Cut on frame boundaries so no frame is dropped or doubled at the seams
+    total_frames = max(1, round(duration * fps))
+    frames_per_chunk = math.ceil(total_frames / num_chunks)
+    bounds = []
+    for first_frame in range(0, total_frames, frames_per_chunk):
+        chunk_start = first_frame / fps
+        chunk_end = min((first_frame + frames_per_chunk) / fps, duration)
+        bounds.append((chunk_start, chunk_end))
+    
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryDirectory(prefix='chunks-', dir=output_dir) as chunk_dir:
+        # Only ship each worker the captions (and images) overlapping its range
+        jobs = [
+            (video_path, chunk_start, chunk_end,
+             [caption for caption in captions
+              if caption['end_time'] > chunk_start and caption['start_time'] < chunk_end],
+             os.path.join(chunk_dir, f'chunk_{i}.mp4'),
+             codec, preset, crf, threads)
+            for i, (chunk_start, chunk_end) in enumerate(bounds)
+        ]
+        with multiprocessing.Pool(len(jobs)) as pool:
+            chunk_paths = pool.map(_render_chunk, jobs)
+        
+        list_path = os.path.join(chunk_dir, 'list.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for chunk_path in chunk_paths:
+                escaped = chunk_path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        subprocess.run([
+            FFMPEG_BINARY, '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-i', video_path,
+            '-map', '0:v', '-map', '1:a?',
+            '-c:v', 'copy', '-c:a', 'aac',
+            output_path
+        ], check=True, capture_output=True, text=True)
+    
+    return len(bounds)
+
+def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, log_path: str,
+                        renderer: str = 'moviepy', parallel: bool = False,
+                        log_level: int = logging.INFO, preset: Optional[str] = None,
+                        crf: Optional[int] = None, threads: Optional[int] = None,
+                        encoder: str = 'auto', dry: bool = False):
+    """Run MoviePy with progressive builder captions
+    
+    renderer='moviepy' composites the caption clips with MoviePy; renderer='ass'
+    writes the same resolved captions to an ASS script next to the output and
+    burns it in with FFmpeg/libass, which avoids per-frame Python compositing;
+    renderer='pipe' streams just the rendered caption layer to FFmpeg, which
+    overlays it on the source video.
+    With parallel=True the MoviePy renderer encodes time ranges in separate
+    processes and concatenates them.
+    
+    preset, crf and threads tune libx264. When None, the FFmpeg renderers and
+    parallel chunks use 'veryfast', the single MoviePy encode keeps MoviePy's
+    'medium', and CRF/threads are left to FFmpeg. encoder='auto' uses NVENC or
+    Quick Sync when available and libx264 otherwise.
+    
+    With dry=True nothing is encoded: the resolved captions are written next
+    to output_path as an .ass script and a .captions.json sidecar.
+    """
+    
+    import subprocess
+    from progressive_captions import CaptionGenerator, MoviePyGenerator
     
     # Setup logging
-    setup_logging(log_path)
+    setup_logging(log_path, log_level)
     logger = logging.getLogger(__name__)
     
     logger.info("=== MoviePy Progressive Builder Captions Test ===")
@@ -121,10 +680,15 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         logger.error(f"Subtitle file not found: {subtitle_path}")
         return False
     
+    # Every reader/clip is registered here when it is created and closed in
+    # the finally below, so an error part-way through doesn't leak FFmpeg
+    # subprocesses or frame buffers
+    stack = contextlib.ExitStack()
     try:
         # Import MoviePy here to avoid import errors if not installed
         try:
-            from moviepy import VideoFileClip, TextClip, CompositeVideoClip
+            from moviepy import VideoFileClip, ImageClip, CompositeVideoClip
+            import numpy as np
             logger.info("MoviePy imported successfully")
         except ImportError as e:
             logger.error(f"MoviePy not available: {e}")
@@ -133,7 +697,7 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         
         # Parse subtitles
         logger.info("Parsing subtitles...")
-        segments = SubtitleParser.parse_subtitles(subtitle_path)
+        segments = _read_subtitles(subtitle_path)
         logger.info(f"Found {len(segments)} subtitle segments")
         
         # Generate caption states
@@ -146,10 +710,16 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         
         # Get video duration (default to 33.23s if we can't detect)
         video_duration = 33.23
+        video_size = None
+        video = None
         try:
-            video_clip = VideoFileClip(video_path)
-            video_duration = video_clip.duration
-            video_clip.close()
+            try:
+                video_duration, video_size = _probe_video(video_path)
+            except FileNotFoundError:
+                # ffprobe not installed; open the clip now and keep it for
+                # compositing rather than opening the file a second time
+                video = stack.enter_context(VideoFileClip(video_path))
+                video_duration = video.duration
             logger.info(f"Detected video duration: {video_duration:.3f}s")
         except Exception as e:
             logger.warning(f"Could not detect video duration, using default: {video_duration}s")
@@ -166,20 +736,7 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         # Generate MoviePy text clip specifications
         logger.info("Generating MoviePy text clip specifications...")
         # Choose a usable font path for MoviePy
-        script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        font_path_candidates = [
-            'Poppins-Black.ttf',
-            'AutoCaptions/Poppins-Black.ttf',
-            os.path.join('AutoCaptions', 'Poppins-Black.ttf'),
-            os.path.join(script_dir, 'AutoCaptions', 'Poppins-Black.ttf'),
-            os.path.join('outputs', 'Poppins-Black.ttf'),
-            os.path.join('AutoCaptions', 'outputs', 'Poppins-Black.ttf')
-        ]
-        chosen_font_path = None
-        for cand in font_path_candidates:
-            if os.path.exists(cand):
-                chosen_font_path = cand
-                break
+        chosen_font_path = _resolve_fonts()['Black']
         if chosen_font_path:
             logger.info(f"Using font for MoviePy: {chosen_font_path}")
             moviepy_gen = MoviePyGenerator(chosen_font_path)
@@ -192,46 +749,27 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         text_clips_specs = moviepy_gen.generate_text_clips(states)
         logger.info(f"Generated {len(text_clips_specs)} text clip specifications")
         
-        # Load video
-        logger.info("Loading video...")
-        video = VideoFileClip(video_path)
+        # Load video (a dry run only needs the probed size and duration)
+        if video is None and not (dry and video_size):
+            logger.info("Loading video...")
+            video = stack.enter_context(VideoFileClip(video_path))
+        if video is not None:
+            video_duration = video.duration
+            video_size = video.size
         
         # Create text clips with styled fonts and colors
         logger.info("Creating styled text clips with dynamic font/color based on content...")
-        text_clips = []
-        
-        # Find actual font file paths - use absolute paths to avoid issues
-        script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        font_dirs = ['.', 'AutoCaptions', os.path.join(script_dir, 'AutoCaptions'), 
-                     os.path.join('AutoCaptions'), 'outputs', os.path.join('AutoCaptions', 'outputs')]
-        
-        # Detect all available fonts for styling
-        black_font = None
-        bold_font = None
-        extrabold_font = None
-        blackitalic_font = None
-        bolditalic_font = None
-        
-        for font_dir in font_dirs:
-            black_path = os.path.join(font_dir, 'Poppins-Black.ttf')
-            bold_path = os.path.join(font_dir, 'Poppins-Bold.ttf')
-            extrabold_path = os.path.join(font_dir, 'Poppins-ExtraBold.ttf')
-            blackitalic_path = os.path.join(font_dir, 'Poppins-BlackItalic.ttf')
-            bolditalic_path = os.path.join(font_dir, 'Poppins-BoldItalic.ttf')
-            
-            if black_font is None and os.path.exists(black_path):
-                black_font = os.path.abspath(black_path) if not os.path.isabs(black_path) else black_path
-            if bold_font is None and os.path.exists(bold_path):
-                bold_font = os.path.abspath(bold_path) if not os.path.isabs(bold_path) else bold_path
-            if extrabold_font is None and os.path.exists(extrabold_path):
-                extrabold_font = os.path.abspath(extrabold_path) if not os.path.isabs(extrabold_path) else extrabold_path
-            if blackitalic_font is None and os.path.exists(blackitalic_path):
-                blackitalic_font = os.path.abspath(blackitalic_path) if not os.path.isabs(blackitalic_path) else blackitalic_path
-            if bolditalic_font is None and os.path.exists(bolditalic_path):
-                bolditalic_font = os.path.abspath(bolditalic_path) if not os.path.isabs(bolditalic_path) else bolditalic_path
+        
+        # Font file paths for styling (absolute, resolved once)
+        fonts = _resolve_fonts()
+        black_font = fonts['Black']
+        
+        # Fallback chains per style, resolved once rather than per caption
+        wow_font = fonts['ExtraBold'] or fonts['Bold'] or black_font
+        italic_font = fonts['BlackItalic'] or fonts['BoldItalic'] or black_font
         
         # Sort specs by start time to ensure proper sequencing
-        sorted_specs = sorted(text_clips_specs, key=lambda x: x['start_time'])
+        sorted_specs = sorted(text_clips_specs, key=operator.itemgetter('start_time'))
         
         # Get word lists for styling
         wow_words = get_wow_words()
@@ -275,14 +813,14 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
             if has_wow_word:
                 # Wow words: ExtraBold font, yellow/gold color
                 return {
-                    'font': extrabold_font if extrabold_font and os.path.exists(extrabold_font) else bold_font if bold_font and os.path.exists(bold_font) else black_font,
+                    'font': wow_font,
                     'color': 'yellow',  # Bright yellow for wow words
                     'style': 'wow'
                 }
             elif has_italic_word:
                 # Italic words: BlackItalic or BoldItalic font
                 return {
-                    'font': blackitalic_font if blackitalic_font and os.path.exists(blackitalic_font) else bolditalic_font if bolditalic_font and os.path.exists(bolditalic_font) else black_font,
+                    'font': italic_font,
                     'color': 'white',  # White for italic words
                     'style': 'italic'
                 }
@@ -366,11 +904,13 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                 # If one caption is shorter and is a subset of the longer one, skip the shorter
                 if words1 < words2 and is_subset(text1, text2):
                     skip_indices.add(i)
-                    logger.info(f"Skipping shorter caption '{text1}' (index {i}) - it's a subset of overlapping caption '{text2}' (index {j})")
+                    logger.debug("Skipping shorter caption %r (index %d) - it's a subset of overlapping caption %r (index %d)",
+                                 text1, i, text2, j)
                     break
                 elif words2 < words1 and is_subset(text2, text1):
                     skip_indices.add(j)
-                    logger.info(f"Skipping shorter caption '{text2}' (index {j}) - it's a subset of overlapping caption '{text1}' (index {i})")
+                    logger.debug("Skipping shorter caption %r (index %d) - it's a subset of overlapping caption %r (index %d)",
+                                 text2, j, text1, i)
         
         logger.info(f"Marked {len(skip_indices)} captions to skip due to subset overlaps")
         
@@ -397,17 +937,16 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         
         # Process each Y position group and store timings in map
         # This ensures clips at the same Y position don't overlap
-        # Sort each group by start_time to process in chronological order
+        # Groups are built from sorted_specs, so they are already in chronological order
         for y_pos, y_specs in specs_by_y.items():
-            # Sort by start_time to ensure chronological processing
-            y_specs.sort(key=lambda x: x[1]['start_time'])
-            
             # Single pass: Calculate non-overlapping timings in one forward sweep
             # This ensures each clip starts AFTER the previous one ends
             # and ends BEFORE (or at) the next one starts - STRICT NO-OVERLAP GUARANTEE
             last_clip_end_time = 0.0
             
-            for i, (idx, spec) in enumerate(y_specs):
+            # Walk (current, next) pairs; the next clip in start order has the
+            # earliest start of all later clips, so no look-ahead scan is needed
+            for (idx, spec), next_item in zip(y_specs, y_specs[1:] + [None]):
                 original_start = spec['start_time']
                 original_end = spec['end_time']
                 
@@ -415,25 +954,19 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                 # This ensures no temporal overlap
                 start_time = max(original_start, last_clip_end_time)
                 
-                # Find the next clip's original start time to cap our end time
-                # We look ahead to find the earliest next clip start time
-                next_start_candidates = []
-                for j in range(i + 1, len(y_specs)):
-                    next_idx, next_spec = y_specs[j]
-                    next_start_candidates.append(next_spec['start_time'])
-                
                 # Calculate end time with strict non-overlap guarantee
-                if next_start_candidates:
-                    # Use the earliest next clip start time as maximum end time
+                if next_item is not None:
+                    # Use the next clip's start time as maximum end time
                     # This ensures we don't overlap with ANY future clip
-                    max_end_time = min(next_start_candidates)
+                    max_end_time = next_item[1]['start_time']
                     min_end_time = start_time + min_duration
                     
                     # Check if we can fit minimum duration before next clip starts
                     if min_end_time > max_end_time:
                         # Can't fit minimum duration without overlapping - skip this clip
                         gap = max_end_time - start_time
-                        logger.info(f"Skipping clip {idx} '{spec['text'][:40]}' at Y={y_pos} - cannot fit {min_duration:.3f}s (gap available: {gap:.3f}s) before next clip at {max_end_time:.3f}s")
+                        logger.debug("Skipping clip %d %r at Y=%s - cannot fit %.3fs (gap available: %.3fs) before next clip at %.3fs",
+                                     idx, spec['text'][:40], y_pos, min_duration, gap, max_end_time)
                         timing_map[idx] = {
                             'start_time': start_time,
                             'end_time': max_end_time,
@@ -489,7 +1022,8 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                 start_adjusted = abs(start_time - original_start) > 0.01
                 end_adjusted = abs(end_time - original_end) > 0.01
                 if start_adjusted or end_adjusted:
-                    logger.debug(f"Timing adjusted for clip {idx} '{spec['text'][:40]}' at Y={y_pos}: {start_time:.3f}s-{end_time:.3f}s (original: {original_start:.3f}s-{original_end:.3f}s)")
+                    logger.debug("Timing adjusted for clip %d %r at Y=%s: %.3fs-%.3fs (original: %.3fs-%.3fs)",
+                                 idx, spec['text'][:40], y_pos, start_time, end_time, original_start, original_end)
         
         # Rebuild calculated_timings in original order
         # Mark skipped indices from subset detection as skipped
@@ -510,111 +1044,73 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                     'skip': False
                 }))
         
+        # Layout constants shared by every caption, computed once per video
+        # Constrain text width to 90% of video width (972px) to prevent clipping
+        video_width, video_height = video_size or (1080, 1920)
+        
+        # Calculate safe text area: 90% of video width (as per spec)
+        safe_width = int(video_width * 0.9)  # 972px for 1080px video
+        horizontal_padding = 25  # Horizontal padding to prevent edge clipping
+        
         # Second pass: Create clips with resolved timings
-        for i, spec in enumerate(sorted_specs):
-            try:
+        def _build_clips(sorted_specs):
+            """Yield (clip, caption event) for every caption that should be rendered"""
+            for i, spec in enumerate(sorted_specs):
+                caption_text = spec['text']
+                
                 # Skip if marked for skipping
                 if calculated_timings[i]['skip']:
-                    logger.debug(f"Skipping clip {i} '{spec['text']}' due to timing constraints")
+                    logger.debug("Skipping clip %d %r due to timing constraints", i, caption_text)
                     continue
                 
-                caption_text = spec['text']
-                
                 # Use calculated timings (guaranteed no overlaps)
                 start_time = calculated_timings[i]['start_time']
                 end_time = calculated_timings[i]['end_time']
                 
-                # Extract Y position safely
-                if isinstance(spec['position'], tuple) and len(spec['position']) == 2:
-                    base_y = spec['position'][1]
-                else:
-                    base_y = 1660  # Fallback
-                
-                # Determine caption style based on content (wow words, italic words, etc.)
-                style_info = determine_caption_style(caption_text, wow_words, italic_words)
-                caption_font = style_info['font']
-                caption_color = style_info['color']
-                style_type = style_info['style']
-                
-                # Create styled caption clip with appropriate font and color
-                # Constrain text width to 90% of video width (972px) to prevent clipping
-                # Use method='caption' which handles text rendering properly with margins
-                font_size = spec['font_size']
-                video_width = video.size[0] if hasattr(video, 'size') else 1080
-                video_height = video.size[1] if hasattr(video, 'size') else 1920
-                
-                # Calculate safe text area: 90% of video width (as per spec)
-                safe_width = int(video_width * 0.9)  # 972px for 1080px video
+                # Don't render captions that would never be on screen: an empty
+                # window, or one starting after the video ends
+                if end_time <= start_time or start_time >= video_duration:
+                    logger.debug("Skipping collapsed caption %r (%.3fs-%.3fs)", caption_text, start_time, end_time)
+                    continue
                 
-                # Ensure text fits within safe width and has proper vertical padding to prevent clipping
-                # Strategy: Create clip with margin for padding, then check width and recreate with size constraint if needed
                 try:
+                    # Extract Y position safely
+                    if isinstance(spec['position'], tuple) and len(spec['position']) == 2:
+                        base_y = spec['position'][1]
+                    else:
+                        base_y = 1660  # Fallback
+                    
+                    # Determine caption style based on content (wow words, italic words, etc.)
+                    style_info = determine_caption_style(caption_text, wow_words, italic_words)
+                    caption_font = style_info['font']
+                    caption_color = style_info['color']
+                    style_type = style_info['style']
+                    
+                    # Create styled caption clip with appropriate font and color
+                    font_size = spec['font_size']
+                    
                     # Calculate proper padding to prevent character clipping
                     # Vertical padding: space for ascenders (h, b, d, l, t) and descenders (p, g, y, j)
                     # For 54px font, we need generous padding to ensure full character display
                     # Poppins font has larger ascenders/descenders, so we need more padding
                     vertical_padding = int(font_size * 0.6)  # 60% padding for ascenders/descenders (very generous)
-                    horizontal_padding = 25  # Horizontal padding to prevent edge clipping
                     
-                    # Create TextClip with method='caption' for better text rendering
-                    # The caption method handles text wrapping and respects margins better
-                    # Constrain width to safe area from the start to prevent horizontal clipping
-                    try:
-                        if caption_font and os.path.exists(caption_font):
-                            base_clip = TextClip(
-                                text=caption_text,
-                                font=caption_font,
-                                font_size=font_size,
-                                color=caption_color,
-                                stroke_color='black',
-                                stroke_width=2,
-                                method='caption',  # Use caption method for better text handling
-                                size=(safe_width, None),  # Constrain width to safe area, auto height
-                                margin=(horizontal_padding, vertical_padding)  # Generous padding to prevent clipping
-                            )
-                        else:
-                            base_clip = TextClip(
-                                text=caption_text,
-                                font_size=font_size,
-                                color=caption_color,
-                                stroke_color='black',
-                                stroke_width=2,
-                                method='caption',  # Use caption method for better text handling
-                                size=(safe_width, None),  # Constrain width to safe area, auto height
-                                margin=(horizontal_padding, vertical_padding)  # Generous padding to prevent clipping
-                            )
-                    except Exception as e_caption:
-                        # Fallback: If caption method fails, use label method with margin
-                        logger.debug(f"Caption method failed for '{caption_text}', trying label: {e_caption}")
-                        if caption_font and os.path.exists(caption_font):
-                            base_clip = TextClip(
-                                text=caption_text,
-                                font=caption_font,
-                                font_size=font_size,
-                                color=caption_color,
-                                stroke_color='black',
-                                stroke_width=2,
-                                method='label',  # Fallback to label method
-                                margin=(horizontal_padding, vertical_padding)  # Still add margin
-                            )
-                        else:
-                            base_clip = TextClip(
-                                text=caption_text,
-                                font_size=font_size,
-                                color=caption_color,
-                                stroke_color='black',
-                                stroke_width=2,
-                                method='label',  # Fallback to label method
-                                margin=(horizontal_padding, vertical_padding)  # Still add margin
-                            )
-                        
-                        # For label method, check width and handle if too wide
-                        if hasattr(base_clip, 'size') and base_clip.size:
-                            clip_width = base_clip.size[0]
-                            if clip_width > safe_width:
-                                # Label method doesn't wrap, so we need to scale or skip wide text
-                                # For now, log a warning - in production you might want to wrap text manually
-                                logger.warning(f"Label method clip '{caption_text}' width {clip_width} exceeds safe width {safe_width}")
+                    # Rasterize once with Pillow and wrap in an ImageClip. This
+                    # avoids TextClip's per-clip font reloads and per-character
+                    # line-break measuring, and repeated captions hit the cache.
+                    caption_img = _render_caption(
+                        caption_text,
+                        caption_font,
+                        font_size,
+                        caption_color,
+                        safe_width,
+                        (horizontal_padding, vertical_padding)
+                    )
+                    clip_width = caption_img.shape[1]
+                    if clip_width > safe_width + 2 * horizontal_padding:
+                        # A single word wider than the safe area can't be wrapped
+                        logger.warning(f"Caption '{caption_text}' width {clip_width} exceeds safe width {safe_width}")
+                    base_clip = ImageClip(caption_img, transparent=True)
                     
                     # Position and time the clip
                     # Ensure the clip stays within video bounds
@@ -637,21 +1133,39 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                     # Use 'center' for both to center the clip at base_y
                     base_clip = base_clip.with_position(('center', base_y))
                     base_clip = base_clip.with_start(start_time).with_end(end_time)
-                    text_clips.append(base_clip)
-                    
-                    # Log caption creation with style information
-                    style_desc = f"[{style_type}]" if style_type != 'default' else ""
-                    logger.info(f"Created caption {style_desc}: '{caption_text}' at {start_time:.3f}s to {end_time:.3f}s (font: {os.path.basename(caption_font) if caption_font else 'default'}, color: {caption_color})")
-                    
+                    stack.callback(base_clip.close)
                 except Exception as e:
                     logger.error(f"Could not create text clip for '{caption_text}': {e}")
                     import traceback
                     logger.error(traceback.format_exc())
                     continue
                 
-            except Exception as e:
-                logger.warning(f"Failed to create text clip for '{spec['text']}': {e}")
-                continue
+                # Log caption creation with style information
+                if logger.isEnabledFor(logging.DEBUG):
+                    style_desc = f"[{style_type}]" if style_type != 'default' else ""
+                    logger.debug("Created caption %s: %r at %.3fs to %.3fs (font: %s, color: %s)",
+                                 style_desc, caption_text, start_time, end_time,
+                                 os.path.basename(caption_font) if caption_font else 'default', caption_color)
+                
+                yield base_clip, {
+                    'text': caption_text,
+                    'start_time': start_time,
+                    'end_time': end_time,
+                    'font': caption_font,
+                    'font_size': font_size,
+                    'color': caption_color,
+                    'style': style_type,
+                    # Top of the text line: same padding + 2px stroke offset as the Pillow image
+                    'y': base_y + vertical_padding + 2,
+                    'position_y': base_y,
+                    'max_width': safe_width,
+                    'margin': (horizontal_padding, vertical_padding),
+                    'image': caption_img
+                }
+        
+        built = list(_build_clips(sorted_specs))
+        text_clips = [clip for clip, _ in built]
+        caption_events = [event for _, event in built]  # Resolved captions for the ASS, pipe and parallel renderers
         
         logger.info(f"Successfully created {len(text_clips)} text clips")
         
@@ -698,7 +1212,7 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
                     'duration': clip.duration
                 })
             except Exception as e:
-                logger.debug(f"Could not extract position for clip {i}: {e}")
+                logger.debug("Could not extract position for clip %d: %s", i, e)
                 clip_info.append({
                     'index': i,
                     'clip': clip,
@@ -722,30 +1236,36 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         
         # Check for overlaps between base clips at the same Y position
         for y_pos, base_clips in base_clips_by_y.items():
+            if len(base_clips) < 2:
+                continue
+            
             # Sort by start time
-            base_clips_sorted = sorted(base_clips, key=lambda x: x['start'])
+            base_clips_sorted = sorted(base_clips, key=operator.itemgetter('start'))
             
-            # Check consecutive base clips for overlaps
-            for j in range(len(base_clips_sorted) - 1):
+            # Check consecutive base clips for overlaps: compare every clip's end
+            # with the next clip's start in one vectorized step, and only visit
+            # the (normally absent) overlapping pairs
+            count = len(base_clips_sorted)
+            starts = np.fromiter((info['start'] for info in base_clips_sorted), dtype=np.float64, count=count)
+            ends = np.fromiter((info['end'] for info in base_clips_sorted), dtype=np.float64, count=count)
+            for j in np.flatnonzero(ends[:-1] > starts[1:]):
                 clip1 = base_clips_sorted[j]
                 clip2 = base_clips_sorted[j + 1]
                 
-                # Check if clip1 ends after clip2 starts (overlap)
-                if clip1['end'] > clip2['start']:
-                    # Real overlap between base clips - this is a problem!
-                    overlap_details.append({
-                        'y_pos': y_pos,
-                        'clip1_idx': clip1['index'],
-                        'clip1_start': clip1['start'],
-                        'clip1_end': clip1['end'],
-                        'clip1_duration': clip1['duration'],
-                        'clip2_idx': clip2['index'],
-                        'clip2_start': clip2['start'],
-                        'clip2_end': clip2['end'],
-                        'clip2_duration': clip2['duration']
-                    })
-                    overlapping_found = True
-                    logger.warning(f"Overlap detected at Y={y_pos}: base clip {clip1['index']} ({clip1['start']:.3f}s-{clip1['end']:.3f}s, dur={clip1['duration']:.3f}s) overlaps with base clip {clip2['index']} ({clip2['start']:.3f}s-{clip2['end']:.3f}s, dur={clip2['duration']:.3f}s)")
+                # Real overlap between base clips - this is a problem!
+                overlap_details.append({
+                    'y_pos': y_pos,
+                    'clip1_idx': clip1['index'],
+                    'clip1_start': clip1['start'],
+                    'clip1_end': clip1['end'],
+                    'clip1_duration': clip1['duration'],
+                    'clip2_idx': clip2['index'],
+                    'clip2_start': clip2['start'],
+                    'clip2_end': clip2['end'],
+                    'clip2_duration': clip2['duration']
+                })
+                overlapping_found = True
+                logger.warning(f"Overlap detected at Y={y_pos}: base clip {clip1['index']} ({clip1['start']:.3f}s-{clip1['end']:.3f}s, dur={clip1['duration']:.3f}s) overlaps with base clip {clip2['index']} ({clip2['start']:.3f}s-{clip2['end']:.3f}s, dur={clip2['duration']:.3f}s)")
         
         if not overlapping_found:
             logger.info("[OK] No overlapping base captions detected at same level")
@@ -755,42 +1275,133 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
             for overlap in overlap_details:
                 logger.error(f"  Overlap at Y={overlap['y_pos']}: clip {overlap['clip1_idx']} ({overlap['clip1_start']:.3f}s-{overlap['clip1_end']:.3f}s) overlaps with clip {overlap['clip2_idx']} ({overlap['clip2_start']:.3f}s-{overlap['clip2_end']:.3f}s)")
         
-        # Composite video
-        logger.info("Compositing video with text clips...")
-        final_video = CompositeVideoClip([video] + text_clips)
-        
-        # Write output
-        logger.info(f"Writing output to: {output_path}")
-        final_video.write_videofile(
-            output_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile=f'temp-audio-{os.getpid()}.m4a',
-            remove_temp=True,
-            logger=None  # Suppress MoviePy's own logging
-        )
-        
-        # Clean up
-        video.close()
-        final_video.close()
-        for clip in text_clips:
-            clip.close()
+        if dry:
+            # Timing iteration only: emit the captions without touching the
+            # video stream; the .ass can be muxed in later with -c copy
+            output_base = os.path.splitext(output_path)[0]
+            _write_ass(caption_events, output_base + '.ass', video_size)
+            _write_caption_json(caption_events, output_base + '.captions.json', video_size)
+            logger.info(f"Dry run: wrote {output_base}.ass and {output_base}.captions.json (no video encoded)")
+            return True
         
-        logger.info("MoviePy processing completed successfully")
+        if encoder != 'auto':
+            codec = encoder
+        elif parallel and renderer == 'moviepy':
+            # Every chunk is its own encoder session, which consumer GPUs
+            # limit; libx264 scales with the chunk count instead
+            codec = 'libx264'
+        else:
+            codec = _pick_codec()
+        logger.info(f"Video encoder: {codec}")
         
-        # Verify output
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path) / (1024 * 1024)  # MB
-            logger.info(f"Output file created: {output_path} ({file_size:.2f} MB)")
+        if renderer == 'ass':
+            # Burn the same resolved captions in with FFmpeg/libass instead of
+            # compositing every frame in Python; audio is stream-copied
+            ass_path = os.path.splitext(output_path)[0] + '.ass'
+            _write_ass(caption_events, ass_path, video.size)
+            logger.info(f"ASS captions written to: {ass_path}")
             
-            if file_size > 1:
-                logger.info("[OK] Output file size check passed (> 1 MB)")
-            else:
-                logger.warning("[WARNING] Output file size is small (< 1 MB)")
+            logger.info(f"Writing output to: {output_path}")
+            fonts_dir = os.path.dirname(black_font) if black_font else None
+            try:
+                _burn_ass(video_path, ass_path, fonts_dir, output_path, codec=codec,
+                          preset=preset or 'veryfast', crf=crf, threads=threads)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"FFmpeg failed to burn captions: {e.stderr.strip()}")
+                return False
+            
+            logger.info("FFmpeg/libass processing completed successfully")
+        elif renderer == 'pipe':
+            # Only the caption layer is generated in Python; FFmpeg decodes the
+            # source and does the overlay, so no video frames cross into NumPy
+            logger.info(f"Writing output to: {output_path}")
+            try:
+                _pipe_overlay(video_path, caption_events, video.size, video.fps, video.duration, output_path,
+                              codec=codec, preset=preset or 'veryfast', crf=crf, threads=threads)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"FFmpeg failed to overlay captions: {e.stderr.strip()}")
+                return False
+            
+            logger.info("FFmpeg overlay processing completed successfully")
+        elif parallel:
+            # Split the timeline and encode the pieces concurrently; a single
+            # libx264 process stops scaling at a handful of threads
+            num_chunks = max(2, (os.cpu_count() or 1) // 4)
+            if codec != 'libx264' and num_chunks > HW_ENCODER_SESSIONS:
+                logger.info(f"Limiting to {HW_ENCODER_SESSIONS} chunks for the {codec} encoder's session limit")
+                num_chunks = HW_ENCODER_SESSIONS
+            logger.info(f"Writing output to: {output_path} ({num_chunks} parallel chunks)")
+            try:
+                written = _encode_parallel(
+                    video_path, caption_events, video.duration, video.fps, output_path, num_chunks,
+                    codec=codec, preset=preset or 'veryfast', crf=crf,
+                    # Split an explicit thread budget across the workers
+                    threads=max(1, threads // num_chunks) if threads else 2
+                )
+            except subprocess.CalledProcessError as e:
+                logger.error(f"FFmpeg failed to concatenate chunks: {e.stderr.strip()}")
+                return False
+            logger.info(f"Encoded and concatenated {written} chunks")
+            
+            logger.info("MoviePy processing completed successfully")
         else:
+            # Composite video
+            # Use the video itself as the opaque background: the default
+            # transparent composite blits onto an extra ColorClip and builds a
+            # nested mask composite that is evaluated on every frame. With
+            # use_bgclip, MoviePy takes duration/audio from the overlays only,
+            # so carry the video's over explicitly.
+            if text_clips:
+                logger.info("Compositing video with text clips...")
+                final_video = stack.enter_context(CompositeVideoClip(
+                    [video] + text_clips, size=video.size, use_bgclip=True
+                ).with_duration(video.duration).with_audio(video.audio))
+            else:
+                # use_bgclip takes the end time from the overlays, and there are
+                # none; write the uncaptioned video as-is
+                logger.info("No captions to composite; writing the video unchanged")
+                final_video = video
+            
+            # Write output
+            logger.info(f"Writing output to: {output_path}")
+            codec_preset, params = _codec_settings(codec, preset or 'medium', crf)
+            final_video.write_videofile(
+                output_path,
+                codec=codec,
+                preset=codec_preset,
+                threads=threads,
+                ffmpeg_params=params or None,
+                audio_codec='aac',
+                temp_audiofile=f'temp-audio-{os.getpid()}.m4a',
+                remove_temp=True,
+                logger=None  # Suppress MoviePy's own logging
+            )
+            
+            # Clean up now rather than on return: clips reference themselves
+            # through their frame functions, so the caption images and frame
+            # buffers are only reclaimed by a collection pass
+            stack.close()
+            text_clips.clear()
+            del final_video
+            gc.collect()
+            
+            logger.info("MoviePy processing completed successfully")
+        
+        # Verify output (one stat for both existence and size)
+        try:
+            output_stat = os.stat(output_path)
+        except FileNotFoundError:
             logger.error("[ERROR] Output file was not created")
             return False
         
+        file_size = output_stat.st_size / (1024 * 1024)  # MB
+        logger.info(f"Output file created: {output_path} ({file_size:.2f} MB)")
+        
+        if file_size > 1:
+            logger.info("[OK] Output file size check passed (> 1 MB)")
+        else:
+            logger.warning("[WARNING] Output file size is small (< 1 MB)")
+        
         return True
         
     except Exception as e:
@@ -798,6 +1409,18 @@ def run_moviepy_builder(video_path: str, subtitle_path: str, output_path: str, l
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         return False
+    finally:
+        stack.close()
+
+def _crf_arg(value: str) -> int:
+    """argparse type for --crf: an integer in the encoder's 0-51 range"""
+    try:
+        crf = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if not 0 <= crf <= 51:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 51, got {crf}")
+    return crf
 
 def main():
     parser = argparse.ArgumentParser(description='Run MoviePy Progressive Builder Captions Test')
@@ -805,6 +1428,26 @@ def main():
     parser.add_argument('--subs', required=True, help='Input subtitle file path')
     parser.add_argument('--out', required=True, help='Output video file path')
     parser.add_argument('--log', required=True, help='Log file path')
+    parser.add_argument('--renderer', choices=['moviepy', 'ass', 'pipe'], default='moviepy',
+                        help='moviepy: composite caption clips in MoviePy (default); '
+                             'ass: burn an ASS script in with FFmpeg/libass (much faster); '
+                             'pipe: stream the caption layer to an FFmpeg overlay')
+    parser.add_argument('--parallel', action='store_true',
+                        help='MoviePy renderer only: encode time chunks in parallel processes '
+                             'and concatenate them')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING'], default='INFO',
+                        help='Logging level; DEBUG adds a line per caption (default: INFO)')
+    parser.add_argument('--dry', action='store_true',
+                        help='Write the captions as <out>.ass and <out>.captions.json only; no video is encoded')
+    parser.add_argument('--preset', choices=X264_PRESETS,
+                        help='libx264 preset (default: medium for the MoviePy renderer, '
+                             'veryfast for the others and for --parallel)')
+    parser.add_argument('--crf', type=_crf_arg, metavar='0-51',
+                        help='Constant rate factor (constant quality on hardware encoders); lower is higher quality (default: 23)')
+    parser.add_argument('--threads', type=int,
+                        help='Encoder threads (default: chosen by FFmpeg)')
+    parser.add_argument('--encoder', choices=['auto'] + ENCODERS, default='auto',
+                        help='H.264 encoder; auto prefers NVENC, then Quick Sync, then libx264 (default: auto)')
     
     args = parser.parse_args()
     
@@ -814,10 +1457,18 @@ def main():
     
     # Run the test
     success = run_moviepy_builder(
-        args.video, args.subs, args.out, args.log
+        args.video, args.subs, args.out, args.log,
+        renderer=args.renderer, parallel=args.parallel,
+        log_level=getattr(logging, args.log_level),
+        preset=args.preset, crf=args.crf, threads=args.threads,
+        encoder=args.encoder, dry=args.dry
     )
     
-    if success:
+    if success and args.dry:
+        output_base = os.path.splitext(args.out)[0]
+        print(f"[SUCCESS] Dry run wrote captions: {output_base}.ass, {output_base}.captions.json")
+        sys.exit(0)
+    elif success:
         print(f"[SUCCESS] MoviePy test completed successfully: {args.out}")
         sys.exit(0)
     else: